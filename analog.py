@@ -4,13 +4,20 @@
 """Display an analog clock face on an inky display."""
 
 from PIL import Image, ImageDraw, ImageFont
-from typing import Tuple, Union, Optional, Literal
+from typing import Any, Dict, Tuple, Union, Optional, Literal
 from utils.utils import clamp
+from utils.dither import get_palette
+from utils.lib import load_logging
+from utils.astronomy import Almanac, Day
+from utils.refresh import RefreshPolicy
+from utils.panel import InkySink, PanelBuffer, export_png
+import functools
 import math
 import time
 import json
 import pprint
-from random import randint
+import sys
+import toml
 import logging
 
 
@@ -52,8 +59,10 @@ class Clock(object):
 
         self.__image: Image.Image
         self.__image_draw: ImageDraw.ImageDraw
-        self.__manual: bool
+        self.__manual: bool = False
         self.__time: time.struct_time
+        self.__location: Optional[Tuple[float, float]] = None
+        self.__almanac: Optional[Almanac] = None
 
         if face not in ("simple", "fancy", "numbered"):
             raise ValueError('face must be "simple", "fancy", or "numbered"')
@@ -75,6 +84,10 @@ class Clock(object):
         self.__image_draw = ImageDraw.Draw(self.__image)
 
         self._draw_face()
+        if self.__location is not None:
+            if self.__almanac is None or self.__almanac.year != self.__time.tm_year:
+                self.__almanac = Almanac(*self.__location, self.__time.tm_year)
+            self._draw_almanac(self.__almanac.lookup(self.__time))
         self._draw_hands()
 
     def _draw_face(self) -> None:
@@ -86,6 +99,10 @@ class Clock(object):
         if self.__face == "numbered":
             raise NotImplementedError("Numerical faceplate not yet supported.")
 
+    def _draw_almanac(self, day: Day) -> None:
+        draw_daylight(self.__center, int(self.__radius * 0.8), day, self.__image)
+        draw_moon((self.__radius, int(self.__radius * 1.5)), self.__radius // 8, day.moon_phase, self.__image)
+
     def _draw_hands(self) -> None:
         pass
 
@@ -107,6 +124,18 @@ class Clock(object):
         """Unset the clock's fixed time, allowing it to update to localtime again."""
         self.__manual = False
 
+    def set_location(self, location: Optional[Tuple[float, float]]) -> None:
+        """Set the location used to draw the day/night arc and moon phase.
+
+        The almanac for the clock's year is loaded when drawing, and reloaded when the year changes.
+
+        :param location:
+            Latitude and longitude in degrees, or None to stop drawing the overlay.
+        :type location: tuple[float, float], optional
+        """
+        self.__location = location
+        self.__almanac = None
+
     def set_style(
         self,
         *,
@@ -266,6 +295,59 @@ def draw_pin(center: Tuple[int, int], radius: int, image: Image.Image) -> None:
     )
 
 
+def draw_daylight(center: Tuple[int, int], radius: int, day: Day, image: Image.Image) -> None:
+    """Draw an arc covering the hours of daylight on a 24 hour ring.
+
+    Args:
+        center: Center point of the clock face
+        radius: Radius of the arc
+        day:    Almanac entry for the day to draw
+        image:  Image to draw on to
+
+    Notes:
+        Midnight sits at the bottom of the ring and noon at the top.
+
+    """
+    draw = ImageDraw.Draw(image)
+    bounds = [(center[0] - radius, center[1] - radius), (center[0] + radius, center[1] + radius)]
+    if day.sunrise is None or day.sunset is None:
+        if day.day_length > 0:
+            draw.ellipse(bounds, outline=2, width=2)
+        return
+
+    sunrise = day.sunrise.tm_hour + day.sunrise.tm_min / 60
+    sunset = day.sunset.tm_hour + day.sunset.tm_min / 60
+    draw.arc(bounds, sunrise * 15 + 90, sunset * 15 + 90, fill=2, width=2)
+
+
+def draw_moon(center: Tuple[int, int], radius: int, phase: float, image: Image.Image) -> None:
+    """Draw the moon with its lit portion for the given phase.
+
+    Args:
+        center: Center point of the moon
+        radius: Radius of the moon
+        phase:  Moon phase from 0 (new) through 0.5 (full) to 1
+        image:  Image to draw on to
+
+    """
+    draw = ImageDraw.Draw(image)
+    terminator = math.cos(2 * math.pi * phase)
+    side = 1 if phase < 0.5 else -1
+
+    limb = []
+    shadow = []
+    for step in range(-90, 91, 15):
+        base_x = math.cos(math.radians(step)) * radius
+        base_y = math.sin(math.radians(step)) * radius + center[1]
+        limb.append((center[0] + side * base_x, base_y))
+        shadow.append((center[0] + side * terminator * base_x, base_y))
+
+    draw.polygon(limb + shadow[::-1], fill=2)
+    draw.ellipse(
+        [(center[0] - radius, center[1] - radius), (center[0] + radius, center[1] + radius)], outline=1
+    )
+
+
 def draw_date(now: time.struct_time, image: Image.Image, size: int = 16) -> None:
     """Draw date information to the screen.
 
@@ -275,44 +357,67 @@ def draw_date(now: time.struct_time, image: Image.Image, size: int = 16) -> None
         size:  Font size of the date
 
     """
-    font = ImageFont.truetype("resources/alagard.ttf", size=size)
+    font = load_font(size)
     draw = ImageDraw.Draw(image)
-    draw.text((4, 4), time.strftime("%b %d\n%a\n%Y"), font=font, fill=1)
+    draw.text((4, 4), time.strftime("%b %d\n%a\n%Y", now), font=font, fill=1)
 
 
-def draw_weather(image: Image.Image, size: int = 16) -> None:
-    """Draw some local weather information to the screen.
+def load_forecast(path: str = "forecast.json") -> Optional[Dict[str, Any]]:
+    """Load saved forecast data.
 
     Args:
-        image: The image to draw to
+        path: Location of the forecast JSON file
+
+    Returns:
+        The forecast data, or None if no forecast has been saved
 
     """
     logger = logging.getLogger(__name__)
-    logger.debug(f"Input values:\nImage:\t{image}\nSize:\t{size}")
     try:
-        with open("forecast.json", "r") as infile:
-            forecast = json.load(infile)
+        with open(path, "r") as infile:
+            forecast: Dict[str, Any] = json.load(infile)
     except FileNotFoundError:
         logger.error("No forecast data found in directory.")
-        return
+        return None
 
-    logger.debug(f"Forecast JSON loaded:\n{pprint.pformat(forecast)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Forecast JSON loaded:\n%s", pprint.pformat(forecast))
+    return forecast
+
+
+def draw_weather(image: Image.Image, forecast: Dict[str, Any], size: int = 16) -> None:
+    """Draw some local weather information to the screen.
+
+    Args:
+        image:    The image to draw to
+        forecast: Forecast data as loaded by load_forecast
+        size:     Font size of the weather text
+
+    """
+    logger = logging.getLogger(__name__)
+    logger.debug("Input values:\nImage:\t%s\nSize:\t%s", image, size)
     now = forecast["currently"]
-    draw.ImageDraw.Draw(image)
-    font = ImageFont.truetype("resources/alagard.ttf", size=size)
-    tw, th = draw.textsize(now["temperature"], font)
-    atw, ath = draw.textsize(now["apparentTemperature"], font)
-    ww, wh = draw.textsize(now["summary"], font)
+    # Temperatures are numbers in the saved forecast, the font has no degree sign.
+    summary = str(now["summary"])
+    temperature = f"{now['temperature']:.0f}"
+    apparent = f"{now['apparentTemperature']:.0f}"
+    draw = ImageDraw.Draw(image)
+    font = load_font(size)
+    tw, th = draw.textbbox((0, 0), temperature, font=font)[2:]
+    atw, ath = draw.textbbox((0, 0), apparent, font=font)[2:]
+    ww, wh = draw.textbbox((0, 0), summary, font=font)[2:]
     wl = max(128, 212 - ww)
-    logger.debug(f"Calculated text variables:\n"
-                 f"Temp width, height: {tw}, {th}\n"
-                 f"Apparent temp width, height: {atw}, {ath}\n"
-                 f"Weather width, height: {ww}, {wh}\n"
-                 f"Weather left edge: {wl}"
+    logger.debug(
+        "Calculated text variables:\n"
+        "Temp width, height: %s, %s\n"
+        "Apparent temp width, height: %s, %s\n"
+        "Weather width, height: %s, %s\n"
+        "Weather left edge: %s",
+        tw, th, atw, ath, ww, wh, wl,
     )
-    draw.text((wl, 4), now["summary"], font=font, fill=1, align="right")
-    draw.text((212 - tw, 20), now["temperature"], font=font, fill=1, align="right")
-    draw.text((212 - atw, 36), now["apparentTemperature"], font=font, fill=1, align="right")
+    draw.text((wl, 4), summary, font=font, fill=1, align="right")
+    draw.text((212 - tw, 20), temperature, font=font, fill=1, align="right")
+    draw.text((212 - atw, 36), apparent, font=font, fill=1, align="right")
 
     icons = {
         "overcast": "cloud",
@@ -326,12 +431,42 @@ def draw_weather(image: Image.Image, size: int = 16) -> None:
     }
 
     try:
-        weather_icon = icons[now["summary"]]
+        weather_icon = icons[summary]
     except Exception:
         pass
     else:
-        weather_image = Image.open(f"resources/icon-{weather_icon}.png")
-        image.paste(weather_image, (212 - weather_image.height, 104 - weather_image.width), create_mask(weather_image))
+        weather_image, weather_mask = load_icon(weather_icon)
+        image.paste(weather_image, (212 - weather_image.height, 104 - weather_image.width), weather_mask)
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(size: int) -> ImageFont.ImageFont:
+    """Load the display font, cached per size.
+
+    Args:
+        size: Font size to load
+
+    Returns:
+        The loaded font
+
+    """
+    return ImageFont.truetype("resources/alagard.ttf", size=size)
+
+
+@functools.lru_cache(maxsize=None)
+def load_icon(name: str) -> Tuple[Image.Image, Image.Image]:
+    """Load a weather icon and its paste mask, cached per icon.
+
+    Args:
+        name: Icon name, as in resources/icon-<name>.png
+
+    Returns:
+        The icon image and its mask
+
+    """
+    icon = Image.open(f"resources/icon-{name}.png")
+    icon.load()
+    return icon, create_mask(icon)
 
 
 def create_mask(source: Image, mask: Tuple[int, int, int] = (0, 1, 2)) -> Image:
@@ -358,47 +493,91 @@ def create_mask(source: Image, mask: Tuple[int, int, int] = (0, 1, 2)) -> Image:
     return mask_image
 
 
-if __name__ == "__main__":
-    palette = 3 * [255]
-    palette += 3 * [0]
-    palette += [166, 152, 1]
-    palette += 759 * [0]
+def render(
+    now: time.struct_time,
+    forecast: Optional[Dict[str, Any]] = None,
+    *,
+    hand_count: int = 2,
+    day: Optional[Day] = None,
+    color: str = "yellow",
+) -> Image.Image:
+    """Render the full analog screen for a given time.
 
+    Args:
+        now:      Struct_time with time to display
+        forecast: Forecast data to draw, weather is skipped if None
+        hand_count: Hands to draw from 0 to 2, hour then minute
+        day:      Almanac entry for the daylight arc and moon, skipped if None
+        color:    Display color whose palette is applied
+
+    Returns:
+        The rendered screen with the display palette applied
+
+    """
     clock_center = 90
 
     img = Image.new("P", (212, 104), color=0)
 
     draw_face((clock_center, 52), 46, img)
 
-    now = time.localtime(time.time())
+    if day is not None:
+        draw_daylight((clock_center, 52), 37, day, img)
+        draw_moon((14, 88), 8, day.moon_phase, img)
+
     minute = now.tm_min
     hour = ((now.tm_hour % 12) + (minute / 60)) * 5
-    draw_fancy_hand((clock_center, 52), 46, minute, img)
-    draw_fancy_hand((clock_center, 52), 30, hour, img)
-
-    # second = now.tm_sec
-    second = randint(0, 59)
-    while (second == minute) or (second == hour):
-        second = randint(0, 59)
-
-    draw_simple_hand((clock_center, 52), 42, second, 2, img)
+    if hand_count >= 2:
+        draw_fancy_hand((clock_center, 52), 46, minute, img)
+    if hand_count >= 1:
+        draw_fancy_hand((clock_center, 52), 30, hour, img)
 
     draw_pin((clock_center, 52), 2, img)
 
     draw_date(now, img)
 
-    draw_weather(img)
+    if forecast is not None:
+        draw_weather(img, forecast)
+
+    img.putpalette(get_palette(color))
+    return img
+
+
+if __name__ == "__main__":
+    load_logging()
+
+    now = time.localtime(time.time())
+
+    try:
+        with open("config/utils.toml", "r") as conffile:
+            utils_config = toml.load(conffile).get("utils", {})
+    except FileNotFoundError:
+        utils_config = {}
+    settings = utils_config.get("analog", {})
+
+    policy = RefreshPolicy("analog", **utils_config.get("refresh", {}))
+    decision = policy.plan(now)
+    if not decision.due:
+        sys.exit()
 
-    img.putpalette(palette)
-    img.save("analog.png")
     try:
-        from inky import InkyPHAT  # type: ignore
-    except RuntimeError:
-        pass
-    except ModuleNotFoundError:
-        pass
-    else:
-        inky_display = InkyPHAT("yellow")
-        inky_display.set_image(img.rotate(180))
-        inky_display.set_border(inky_display.BLACK)
-        inky_display.show()
+        day: Optional[Day] = Almanac(settings["latitude"], settings["longitude"], now.tm_year).lookup(now)
+    except KeyError:
+        day = None
+
+    img = render(now, load_forecast(), hand_count=decision.hand_count, day=day)
+    if settings.get("debug_png", False):
+        export_png(img, "analog.png")
+    if policy.should_push(img):
+        try:
+            from inky import InkyPHAT  # type: ignore
+        except RuntimeError:
+            pass
+        except ModuleNotFoundError:
+            pass
+        else:
+            started = time.perf_counter()
+            inky_display = InkyPHAT("yellow")
+            panel = PanelBuffer.for_display(inky_display, turns=2)
+            panel.write(img)
+            panel.flush(InkySink(inky_display))
+            policy.record_push(img, time.perf_counter() - started)
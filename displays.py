@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Drive several inky displays from one process.
+
+Notes:
+    Every display target listed under system.screen renders from a single
+    snapshot of the configuration, forecast, and almanac, so data is read
+    and fonts and icons are loaded once regardless of the number of targets.
+
+    Targets render concurrently on a thread pool, each finished frame is then
+    handed to that target's own push worker so a slow panel refresh does not
+    hold up the others. Each target's refresh policy decides whether it is due
+    and whether an unchanged frame can be skipped. Run it once a minute, at the
+    start of the minute, for example from cron.
+
+    Frames are written straight into each panel's packed bitplanes. Without
+    a panel attached they go to a simulated SPI sink, set debug_png on a
+    target to also save its frames as PNGs.
+
+Example:
+    Drive an inkyPHAT clock and an inkyWHAT calendar::
+
+        [[system.screen]]
+        util = "analog"
+        type = "phat"
+        color = "yellow"
+        orientation = "landscape"
+        vert_flip = true
+
+        [[system.screen]]
+        util = "calendar"
+        type = "what"
+        color = "red"
+        orientation = "landscape"
+        vert_flip = false
+
+"""
+
+from PIL import Image
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import logging
+import sys
+import time
+import toml
+
+import analog
+import inky_calendar
+from utils.astronomy import Almanac, Day
+from utils.dither import PALETTES
+from utils.lib import load_logging
+from utils.panel import InkySink, PanelBuffer, SimulatedSink, export_png
+from utils.refresh import Decision, RefreshPolicy
+
+
+class Snapshot(NamedTuple):
+    """Data shared by every target for a single render pass."""
+
+    now: time.struct_time
+    config: Dict[str, Any]
+    forecast: Optional[Dict[str, Any]]
+    day: Optional[Day]
+
+
+def _render_analog(snapshot: Snapshot, decision: Decision, color: str) -> Image.Image:
+    return analog.render(
+        snapshot.now, snapshot.forecast, hand_count=decision.hand_count, day=snapshot.day, color=color
+    )
+
+
+def _render_calendar(snapshot: Snapshot, decision: Decision, color: str) -> Image.Image:
+    return inky_calendar.render(color)
+
+
+RENDERERS: Dict[str, Callable[[Snapshot, Decision, str], Image.Image]] = {
+    "analog": _render_analog,
+    "calendar": _render_calendar,
+}
+
+FRAME_SIZES: Dict[str, Tuple[int, int]] = {
+    "analog": (212, 104),
+    "calendar": (400, 300),
+}
+
+PANEL_SIZES: Dict[str, Tuple[int, int]] = {
+    "phat": (212, 104),
+    "what": (400, 300),
+}
+
+
+class Outcome(NamedTuple):
+    """Targets refreshed and targets failed in a single render pass.
+
+    Targets that were not due, or whose frame was unchanged, are in neither.
+    """
+
+    refreshed: List["Target"]
+    failed: List["Target"]
+
+
+class Target(object):
+    """A configured display and the utility rendered to it.
+
+    :param settings:
+        A system.screen entry, with "util", "type", "color", "orientation",
+        and "vert_flip" keys, and optionally a "name" for logs and debug output
+        and "debug_png" to save each frame as a PNG.
+        Only "landscape" orientation is supported, as every util draws its
+        frames at a fixed landscape size.
+    :type settings: dict
+    :param refresh:
+        Keyword arguments for this target's :class:`utils.refresh.RefreshPolicy`.
+    :type refresh: dict, optional
+
+    :raises ValueError:
+        if the util, type, color, or orientation is invalid,
+        or the util's frames do not fit the panel.
+    """
+
+    def __init__(self, settings: Dict[str, Any], refresh: Optional[Dict[str, Any]] = None) -> None:
+        super(Target, self).__init__()
+
+        self.__util = settings.get("util", "analog")
+        self.__type = settings.get("type", "phat")
+        self.__color = settings.get("color", "yellow")
+        self.__name = settings.get("name", f"{self.__type}-{self.__util}")
+
+        if self.__util not in RENDERERS:
+            raise ValueError(f'util must be one of {", ".join(RENDERERS)}')
+        if self.__type not in ("phat", "what"):
+            raise ValueError('type must be "phat" or "what"')
+        if self.__color not in PALETTES:
+            raise ValueError(f'color must be one of {", ".join(PALETTES)}')
+        if settings.get("orientation", "landscape") != "landscape":
+            raise ValueError('orientation must be "landscape", utils only draw landscape frames')
+
+        width, height = FRAME_SIZES[self.__util]
+        if (width, height) != PANEL_SIZES[self.__type]:
+            raise ValueError(f"{self.__util} frames are {width}x{height}, which does not fit a {self.__type}")
+
+        self.__turns = 2 if settings.get("vert_flip", False) else 0
+        self.__debug_png = settings.get("debug_png", False)
+
+        self.__panel: Optional[PanelBuffer] = None
+        self.__sink: Callable[[memoryview, memoryview], None]
+        self.__policy = RefreshPolicy(self.__name, **(refresh or {}))
+        self.__pusher = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.__name)
+
+        self.__logger = logging.getLogger(__name__)
+        self.__logger.debug("%s", self.__dict__)
+
+    def __repr__(self) -> str:
+        return f"Target(name={self.__name})"
+
+    def render(self, snapshot: Snapshot) -> Optional[Image.Image]:
+        """Render this target's utility from a shared snapshot, if its policy says it is due.
+
+        :param snapshot: Data shared by every target.
+        :type snapshot: Snapshot
+
+        :return: The rendered frame, not yet rotated for the panel, or None if not due.
+        :rtype: PIL.Image.Image, optional
+        """
+        decision = self.__policy.plan(snapshot.now)
+        if not decision.due:
+            return None
+        return RENDERERS[self.__util](snapshot, decision, self.__color)
+
+    def push(self, frame: Image.Image) -> "Future[bool]":
+        """Queue a frame for this target's push worker.
+
+        :param frame: Frame to show.
+        :type frame: PIL.Image.Image
+
+        :return:
+            Future completing once the panel has been refreshed,
+            with False if the frame was unchanged and skipped.
+        :rtype: concurrent.futures.Future
+        """
+        return self.__pusher.submit(self._show, frame)
+
+    def close(self) -> None:
+        """Wait for queued pushes to finish and stop the push worker."""
+        self.__pusher.shutdown(wait=True)
+
+    def _show(self, frame: Image.Image) -> bool:
+        if self.__debug_png:
+            export_png(frame, f"{self.__name}.png")
+        if not self.__policy.should_push(frame):
+            return False
+
+        started = time.perf_counter()
+        panel = self._get_panel(frame)
+        panel.write(frame)
+        panel.flush(self.__sink)
+        self.__policy.record_push(frame, time.perf_counter() - started)
+        return True
+
+    def _get_panel(self, frame: Image.Image) -> PanelBuffer:
+        if self.__panel is None:
+            try:
+                from inky import InkyPHAT, InkyWHAT  # type: ignore
+            except (RuntimeError, ModuleNotFoundError):
+                self.__panel = PanelBuffer(*frame.size, turns=self.__turns)
+                self.__sink = SimulatedSink()
+            else:
+                display = (InkyPHAT if self.__type == "phat" else InkyWHAT)(self.__color)
+                self.__panel = PanelBuffer.for_display(display, turns=self.__turns)
+                self.__sink = InkySink(display)
+        return self.__panel
+
+
+def load_targets(config: Dict[str, Any]) -> List[Target]:
+    """Build the display targets listed in a configuration.
+
+    :param dict config: Loaded utilities configuration.
+
+    :return: One target per system.screen entry, a single table is one target.
+    :rtype: list[Target]
+
+    :raises ValueError: if two entries share a name, or any entry is invalid.
+
+    Notes:
+        Entries without a name are named "<type>-<util>", with a numbered suffix
+        when that is already taken, as the name keys each target's policy state.
+    """
+    screens = config["system"]["screen"]
+    if isinstance(screens, dict):
+        screens = [screens]
+    refresh = config.get("utils", {}).get("refresh", {})
+
+    explicit = [settings["name"] for settings in screens if "name" in settings]
+    if len(set(explicit)) != len(explicit):
+        raise ValueError("system.screen names must be unique")
+
+    taken = set(explicit)
+    targets = []
+    for settings in screens:
+        if "name" not in settings:
+            base = f'{settings.get("type", "phat")}-{settings.get("util", "analog")}'
+            name, count = base, 1
+            while name in taken:
+                count += 1
+                name = f"{base}-{count}"
+            taken.add(name)
+            settings = dict(settings, name=name)
+        targets.append(Target(settings, refresh))
+    return targets
+
+
+def take_snapshot(config: Dict[str, Any]) -> Snapshot:
+    """Read the data shared by every target for a render pass.
+
+    :param dict config: Loaded utilities configuration.
+
+    :return: Snapshot of the current time, configuration, forecast, and almanac entry.
+    :rtype: Snapshot
+    """
+    now = time.localtime(time.time())
+    try:
+        settings = config["utils"]["analog"]
+        day: Optional[Day] = Almanac(settings["latitude"], settings["longitude"], now.tm_year).lookup(now)
+    except KeyError:
+        day = None
+    return Snapshot(now, config, analog.load_forecast(), day)
+
+
+def render_targets(targets: List[Target], snapshot: Snapshot) -> Outcome:
+    """Render every target concurrently, hand each frame to its push worker, and wait for the pushes.
+
+    :param targets: Targets to render.
+    :type targets: list[Target]
+    :param snapshot: Data shared by every target.
+    :type snapshot: Snapshot
+
+    :return: Targets whose panel was refreshed, and targets whose render or push failed, each failure is logged.
+    :rtype: Outcome
+    """
+    logger = logging.getLogger(__name__)
+    refreshed: List[Target] = []
+    failed: List[Target] = []
+    pushes: Dict["Future[bool]", Target] = {}
+    if not targets:
+        return Outcome(refreshed, failed)
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        renders = {pool.submit(target.render, snapshot): target for target in targets}
+        for render in as_completed(renders):
+            target = renders[render]
+            try:
+                frame = render.result()
+            except Exception:
+                logger.exception("%s: render failed", target)
+                failed.append(target)
+                continue
+            if frame is not None:
+                pushes[target.push(frame)] = target
+
+    for push in as_completed(pushes):
+        try:
+            pushed = push.result()
+        except Exception:
+            logger.exception("%s: push failed", pushes[push])
+            failed.append(pushes[push])
+        else:
+            if pushed:
+                refreshed.append(pushes[push])
+    return Outcome(refreshed, failed)
+
+
+if __name__ == "__main__":
+    load_logging()
+    logger = logging.getLogger(__name__)
+
+    with open("config/utils.toml", "r") as conffile:
+        config = toml.load(conffile)
+
+    targets = load_targets(config)
+    try:
+        outcome = render_targets(targets, take_snapshot(config))
+    finally:
+        for target in targets:
+            target.close()
+    logger.info(
+        "Refreshed %s of %s displays, %s failed", len(outcome.refreshed), len(targets), len(outcome.failed)
+    )
+    if outcome.failed:
+        sys.exit(1)
@@ -4,6 +4,9 @@
 """Display a calendar populated from google calendar data on an inky display."""
 
 from PIL import Image, ImageDraw  # type: ignore
+from utils.dither import get_palette
+from utils.panel import InkySink, PanelBuffer, export_png
+import toml
 
 # from typing import Tuple
 # import time
@@ -25,18 +28,34 @@ def draw_what_sheet(image: Image.Image) -> None:
         draw.line([(7, line * 45 + 26), (392, line * 45 + 26)], fill=1)
 
 
-if __name__ == "__main__":
-    palette = 3 * [255]
-    palette += 3 * [0]
-    palette += [255, 0, 0]
-    palette += 759 * [0]
+def render(color: str = "red") -> Image.Image:
+    """Render the full calendar screen.
+
+    Args:
+        color: Display color whose palette is applied
 
+    Returns:
+        The rendered screen with the display palette applied
+
+    """
     img = Image.new("P", (400, 300), color=0)
 
     draw_what_sheet(img)
 
-    img.putpalette(palette)
-    img.save("calendar.png")
+    img.putpalette(get_palette(color))
+    return img
+
+
+if __name__ == "__main__":
+    try:
+        with open("config/utils.toml", "r") as conffile:
+            settings = toml.load(conffile).get("utils", {}).get("calendar", {})
+    except FileNotFoundError:
+        settings = {}
+
+    img = render()
+    if settings.get("debug_png", False):
+        export_png(img, "calendar.png")
     try:
         from inky import InkyWHAT  # type: ignore
     except RuntimeError:
@@ -45,6 +64,6 @@ if __name__ == "__main__":
         pass
     else:
         inky_display = InkyWHAT("red")
-        inky_display.set_image(img)
-        inky_display.set_border(inky_display.BLACK)
-        inky_display.show()
+        panel = PanelBuffer.for_display(inky_display)
+        panel.write(img)
+        panel.flush(InkySink(inky_display))
@@ -1,11 +1,27 @@
 # flake8: noqa
-from typing import Tuple, Sequence, Union, Optional
+from typing import Any, Optional, Sequence, Tuple, Union
 
 class Image:
+    size: Tuple[int, int]
+    width: int
+    height: int
+    mode: str
     def __init__(self) -> None: ...
     def putpalette(self, data: Sequence[int]) -> None: ...
-    def save(self, fp: str) -> None: ...
+    def save(self, fp: str, format: Optional[str] = None, **params: Any) -> None: ...
     def rotate(self, angle: Union[int, float]) -> Image: ...
+    def convert(self, mode: Optional[str] = None) -> Image: ...
+    def paste(
+        self,
+        im: Union[Image, int],
+        box: Optional[Union[Tuple[int, int], Tuple[int, int, int, int]]] = None,
+        mask: Optional[Image] = None,
+    ) -> None: ...
+    def load(self) -> Any: ...
+    def getpixel(self, xy: Tuple[int, int]) -> Union[int, Tuple[int, ...]]: ...
+    def putpixel(self, xy: Tuple[int, int], value: Union[int, Tuple[int, ...]]) -> None: ...
+    def tobytes(self) -> bytes: ...
 
 def new(mode: str, size: Tuple[int, int], color: Optional[int] = 0) -> Image: ...
 def open(fp: str) -> Image: ...
+def frombytes(mode: str, size: Tuple[int, int], data: bytes) -> Image: ...
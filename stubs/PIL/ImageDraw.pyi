@@ -12,6 +12,14 @@ class ImageDraw:
         outline: Optional[int] = None,
         width: int = 1,
     ) -> None: ...
+    def arc(
+        self,
+        xy: Union[Sequence[Union[Tuple[float, float], Tuple[int, int]]], Sequence[Union[int, float]]],
+        start: Union[int, float],
+        end: Union[int, float],
+        fill: Optional[int] = None,
+        width: int = 1,
+    ) -> None: ...
     def line(
         self,
         xy: Union[Sequence[Union[Tuple[int, int], Tuple[float, float]]], Sequence[Union[int, float]]],
@@ -62,6 +70,11 @@ class ImageDraw:
         outline: Optional[int] = None,
         width: int = 1,
     ) -> None: ...
-    def textsize(self, text: str, font: Optional[ImageFont] = None) -> Tuple[int, int]: ...
+    def textbbox(
+        self,
+        xy: Union[Tuple[int, int], Tuple[float, float]],
+        text: str,
+        font: Optional[ImageFont] = None,
+    ) -> Tuple[int, int, int, int]: ...
 
 def Draw(im: Image) -> ImageDraw: ...
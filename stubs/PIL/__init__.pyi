@@ -1 +1,2 @@
 # flake8: noqa
+# Stubs for the subset of Pillow used here, matching the Pillow>=8.0.0 pin in requirements.txt.
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Render analog screens across a range of times for previewing layouts.
+
+Notes:
+    Frames are rendered headlessly with fixed forecast data on a process pool
+    and written out as a sprite sheet, an animated PNG, or a directory of frames.
+    The daylight arc and moon are drawn from the [utils.analog] location, as on
+    the panel, unless a location is given on the command line.
+
+    Rendering throughput is reported in frames per second, making this a quick
+    stress test for the rendering path as well.
+
+Example:
+    Render every minute of today into a sprite sheet::
+
+        $ python3 timelapse.py --output day.png
+
+"""
+
+from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Literal, Optional, Tuple
+import argparse
+import datetime
+import os
+import time
+import toml
+
+import analog
+from utils.astronomy import Almanac, Day
+from utils.dither import get_palette
+
+
+_OUTPUT_MODE = Literal["sheet", "apng", "frames"]
+
+_forecast: Optional[Dict[str, Any]] = None
+_days: Dict[Tuple[int, int], Day] = {}
+
+
+def _init_worker(forecast: Optional[Dict[str, Any]], days: Dict[Tuple[int, int], Day]) -> None:
+    global _forecast, _days
+    _forecast = forecast
+    _days = days
+
+
+def _render_frame(now: time.struct_time) -> Image.Image:
+    return analog.render(now, _forecast, day=_days.get((now.tm_year, now.tm_yday)))
+
+
+def frame_times(
+    date: datetime.date, start: datetime.time, end: datetime.time, step: int = 1
+) -> List[time.struct_time]:
+    """Build the list of times to render.
+
+    Args:
+        date:  Day to render
+        start: First time to render
+        end:   Last time to render, inclusive
+        step:  Minutes between frames
+
+    Returns:
+        Local times from start to end, step minutes apart
+
+    Raises:
+        ValueError: if step is not positive or end is before start
+
+    """
+    if step < 1:
+        raise ValueError("step must be at least one minute")
+    current = datetime.datetime.combine(date, start)
+    last = datetime.datetime.combine(date, end)
+    if last < current:
+        raise ValueError("end must not be before start")
+
+    times = []
+    while current <= last:
+        times.append(current.timetuple())
+        current += datetime.timedelta(minutes=step)
+    return times
+
+
+def render_frames(
+    times: List[time.struct_time],
+    forecast: Optional[Dict[str, Any]] = None,
+    *,
+    location: Optional[Tuple[float, float]] = None,
+    workers: Optional[int] = None,
+) -> List[Image.Image]:
+    """Render one analog screen per time across a process pool.
+
+    Args:
+        times:    Times to render
+        forecast: Forecast data shared by every frame
+        location: Latitude and longitude for the daylight arc and moon, skipped if None
+        workers:  Number of worker processes, defaults to the CPU count
+
+    Returns:
+        Rendered frames in the same order as times
+
+    """
+    days: Dict[Tuple[int, int], Day] = {}
+    if location is not None:
+        almanacs: Dict[int, Almanac] = {}
+        for now in times:
+            if now.tm_year not in almanacs:
+                almanacs[now.tm_year] = Almanac(*location, now.tm_year)
+            days[(now.tm_year, now.tm_yday)] = almanacs[now.tm_year].lookup(now)
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(times) // (workers * 4))
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(forecast, days)) as pool:
+        return list(pool.map(_render_frame, times, chunksize=chunksize))
+
+
+def save_sheet(frames: List[Image.Image], path: str, columns: int = 24) -> None:
+    """Save frames as a single sprite sheet.
+
+    Args:
+        frames:  Frames to tile, left to right then top to bottom
+        path:    Where to save the sheet
+        columns: Number of frames per row
+
+    """
+    width, height = frames[0].size
+    rows = -(-len(frames) // columns)
+    sheet = Image.new("P", (width * min(columns, len(frames)), height * rows), color=0)
+    for index, frame in enumerate(frames):
+        sheet.paste(frame, ((index % columns) * width, (index // columns) * height))
+    sheet.putpalette(get_palette("yellow"))
+    sheet.save(path)
+
+
+def save_apng(frames: List[Image.Image], path: str, duration: int = 100) -> None:
+    """Save frames as an animated PNG.
+
+    Args:
+        frames:   Frames to animate
+        path:     Where to save the animation
+        duration: Milliseconds to show each frame
+
+    """
+    frames[0].save(path, save_all=True, append_images=frames[1:], duration=duration, loop=0)
+
+
+def save_frames(frames: List[Image.Image], path: str) -> None:
+    """Save frames as numbered PNGs in a directory.
+
+    Args:
+        frames: Frames to save
+        path:   Directory to save into, created if absent
+
+    """
+    os.makedirs(path, exist_ok=True)
+    digits = len(str(len(frames) - 1))
+    for index, frame in enumerate(frames):
+        frame.save(os.path.join(path, f"frame-{index:0{digits}d}.png"))
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Render analog screens across a range of times.")
+    parser.add_argument("--date", type=datetime.date.fromisoformat, default=datetime.date.today())
+    parser.add_argument("--start", type=datetime.time.fromisoformat, default=datetime.time(0, 0))
+    parser.add_argument("--end", type=datetime.time.fromisoformat, default=datetime.time(23, 59))
+    parser.add_argument("--step", type=int, default=1, help="Minutes between frames")
+    parser.add_argument("--forecast", help="Forecast JSON to draw on every frame")
+    parser.add_argument("--latitude", type=float, help="Defaults to [utils.analog] latitude")
+    parser.add_argument("--longitude", type=float, help="Defaults to [utils.analog] longitude")
+    parser.add_argument("--workers", type=int, help="Worker processes, defaults to the CPU count")
+    parser.add_argument("--format", choices=("sheet", "apng", "frames"), default="sheet")
+    parser.add_argument("--columns", type=int, default=24, help="Frames per row of the sprite sheet")
+    parser.add_argument("--output", default="timelapse.png")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = _parse_args()
+
+    times = frame_times(args.date, args.start, args.end, args.step)
+    forecast = analog.load_forecast(args.forecast) if args.forecast else None
+
+    try:
+        with open("config/utils.toml", "r") as conffile:
+            settings = toml.load(conffile).get("utils", {}).get("analog", {})
+    except FileNotFoundError:
+        settings = {}
+    latitude = args.latitude if args.latitude is not None else settings.get("latitude")
+    longitude = args.longitude if args.longitude is not None else settings.get("longitude")
+    location = None if latitude is None or longitude is None else (latitude, longitude)
+
+    started = time.perf_counter()
+    frames = render_frames(times, forecast, location=location, workers=args.workers)
+    elapsed = time.perf_counter() - started
+
+    mode: _OUTPUT_MODE = args.format
+    if mode == "sheet":
+        save_sheet(frames, args.output, args.columns)
+    elif mode == "apng":
+        save_apng(frames, args.output)
+    else:
+        save_frames(frames, args.output)
+
+    print(f"Rendered {len(frames)} frames in {elapsed:.2f}s ({len(frames) / elapsed:.1f} fps) to {args.output}")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Precompute daily sunrise, sunset, and moon phase for a location.
+
+Notes:
+    A whole year is computed in one vectorized pass using the NOAA sunrise
+    equation and the mean synodic month, then cached on disk. Renderers look
+    days up by index instead of doing any ephemeris math per frame.
+
+    Accuracy is within a minute or two for sunrise and sunset, plenty for
+    a clock face.
+
+"""
+
+from typing import NamedTuple, Optional
+import logging
+import math
+import os
+import time
+import numpy as np
+
+
+_J2000 = 2451545.0
+_UNIX_EPOCH_JD = 2440587.5
+_KNOWN_NEW_MOON_JD = 2451550.1
+_SYNODIC_MONTH = 29.530588853
+_OBLIQUITY = math.radians(23.4397)
+_SUN_ALTITUDE = math.radians(-0.833)
+
+
+class Day(NamedTuple):
+    """Daylight and moon information for a single day.
+
+    Sunrise and sunset are None when the sun never crosses the horizon,
+    day_length is then either zero or a full day.
+    """
+
+    sunrise: Optional[time.struct_time]
+    sunset: Optional[time.struct_time]
+    day_length: float
+    moon_phase: float
+
+
+def compute_year(latitude: float, longitude: float, year: int) -> np.ndarray:
+    """Compute sunrise, sunset, day length, and moon phase for every day of a year.
+
+    :param float latitude: Latitude in degrees, north positive.
+    :param float longitude: Longitude in degrees, east positive.
+    :param int year: Year to compute.
+
+    :return:
+        Array of shape (days, 4) holding sunrise and sunset as unix timestamps
+        (NaN when the sun does not rise or set), day length in seconds,
+        and moon phase from 0 (new) through 0.5 (full) to 1.
+    :rtype: numpy.ndarray
+    """
+    days = np.arange(np.datetime64(f"{year}-01-01"), np.datetime64(f"{year + 1}-01-01")).astype(np.float64)
+
+    mean_solar_noon = np.round(days + _UNIX_EPOCH_JD + 0.5 - _J2000 + 0.0008) - longitude / 360
+    anomaly = np.radians((357.5291 + 0.98560028 * mean_solar_noon) % 360)
+    center = 1.9148 * np.sin(anomaly) + 0.02 * np.sin(2 * anomaly) + 0.0003 * np.sin(3 * anomaly)
+    ecliptic = np.radians((np.degrees(anomaly) + center + 180 + 102.9372) % 360)
+    transit = _J2000 + mean_solar_noon + 0.0053 * np.sin(anomaly) - 0.0069 * np.sin(2 * ecliptic)
+
+    declination = np.arcsin(np.sin(ecliptic) * math.sin(_OBLIQUITY))
+    phi = math.radians(latitude)
+    cos_hour_angle = (math.sin(_SUN_ALTITUDE) - math.sin(phi) * np.sin(declination)) / (
+        math.cos(phi) * np.cos(declination)
+    )
+    hour_angle = np.degrees(np.arccos(np.clip(cos_hour_angle, -1, 1)))
+    crosses = np.abs(cos_hour_angle) <= 1
+
+    table = np.empty((len(days), 4), dtype=np.float64)
+    table[:, 0] = np.where(crosses, (transit - hour_angle / 360 - _UNIX_EPOCH_JD) * 86400, np.nan)
+    table[:, 1] = np.where(crosses, (transit + hour_angle / 360 - _UNIX_EPOCH_JD) * 86400, np.nan)
+    table[:, 2] = hour_angle / 180 * 86400
+    table[:, 3] = ((transit - _KNOWN_NEW_MOON_JD) / _SYNODIC_MONTH) % 1
+    return table
+
+
+class Almanac(object):
+    """A year of daylight and moon information for a location, cached on disk.
+
+    :param float latitude: Latitude in degrees, north positive.
+    :param float longitude: Longitude in degrees, east positive.
+    :param int year: Year to load.
+    :param cache_dir:
+        Directory holding cached tables.
+        Defaults to "cache", created if absent.
+    :type cache_dir: str, optional
+    """
+
+    def __init__(self, latitude: float, longitude: float, year: int, *, cache_dir: str = "cache") -> None:
+        super(Almanac, self).__init__()
+
+        self.__year = year
+        self.__logger = logging.getLogger(__name__)
+
+        path = os.path.join(cache_dir, f"almanac-{year}-{latitude:.4f}-{longitude:.4f}.npy")
+        try:
+            self.__table = np.load(path)
+        except FileNotFoundError:
+            self.__logger.info("No cached almanac for %s, computing", year)
+        except (OSError, ValueError, EOFError) as inst:
+            self.__logger.warning("Ignoring unreadable almanac cache for %s, recomputing - %s", year, inst)
+        else:
+            return
+
+        self.__table = compute_year(latitude, longitude, year)
+        os.makedirs(cache_dir, exist_ok=True)
+        # Written under a per-process name and moved into place, so a power cut
+        # or two runs computing at once never leave a partial cache behind.
+        with open(f"{path}.{os.getpid()}.tmp", "wb") as out:
+            np.save(out, self.__table)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+    def __repr__(self) -> str:
+        return f"Almanac(year={self.__year})"
+
+    @property
+    def year(self) -> int:
+        """The year this almanac covers."""
+        return self.__year
+
+    def lookup(self, now: time.struct_time) -> Day:
+        """Get the daylight and moon information for a day.
+
+        :param now: Any time during the day to look up.
+        :type now: time.struct_time
+
+        :return: Information for the day.
+        :rtype: Day
+
+        :raises ValueError: if the day is not in this almanac's year.
+        """
+        if now.tm_year != self.__year:
+            raise ValueError(f"almanac only covers {self.__year}")
+        sunrise, sunset, day_length, moon_phase = self.__table[now.tm_yday - 1]
+        if math.isnan(sunrise):
+            return Day(None, None, float(day_length), float(moon_phase))
+        return Day(time.localtime(sunrise), time.localtime(sunset), float(day_length), float(moon_phase))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Quantize and dither arbitrary images down to inky display palettes.
+
+Notes:
+    Palette indices follow the inky driver convention: 0 is white, 1 is black,
+    and 2 is the panel's accent color (yellow or red).
+
+    All passes work on whole numpy arrays. Error diffusion walks the image in
+    diagonal wavefronts, so each step quantizes every pixel whose neighbours
+    are already settled in one vectorized operation instead of looping over
+    pixels in Python.
+
+"""
+
+from PIL import Image
+from typing import Dict, List, Literal, Tuple
+import logging
+import numpy as np
+
+
+_COLOR = Tuple[int, int, int]
+_DITHER_MODE = Literal["none", "bayer", "floyd-steinberg"]
+
+WHITE: _COLOR = (255, 255, 255)
+BLACK: _COLOR = (0, 0, 0)
+YELLOW: _COLOR = (166, 152, 1)
+RED: _COLOR = (255, 0, 0)
+
+PALETTES: Dict[str, Tuple[_COLOR, ...]] = {
+    "black": (WHITE, BLACK),
+    "yellow": (WHITE, BLACK, YELLOW),
+    "red": (WHITE, BLACK, RED),
+}
+
+
+def get_palette(color: str) -> List[int]:
+    """Build a flat 256 entry palette for an inky display color.
+
+    :param str color: The display color, "black", "yellow", or "red".
+
+    :return: Palette suitable for :meth:`PIL.Image.Image.putpalette`.
+    :rtype: list[int]
+
+    :raises ValueError: if the color is not a known inky palette.
+    """
+    if color not in PALETTES:
+        raise ValueError(f'color must be one of {", ".join(PALETTES)}')
+    palette = [channel for entry in PALETTES[color] for channel in entry]
+    return palette + (768 - len(palette)) * [0]
+
+
+def bayer_matrix(order: int) -> np.ndarray:
+    """Build a normalized Bayer threshold matrix.
+
+    :param int order: Matrix size is 2 ** order on each side.
+
+    :return: Thresholds in the range [0, 1) centred on 0.5.
+    :rtype: numpy.ndarray
+    """
+    matrix = np.zeros((1, 1), dtype=np.float32)
+    for _ in range(order):
+        matrix = np.block([[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]])
+    return (matrix + 0.5) / matrix.size
+
+
+def _nearest(pixels: np.ndarray, palette: np.ndarray) -> np.ndarray:
+    distance = ((pixels[..., np.newaxis, :] - palette) ** 2).sum(axis=-1)
+    return distance.argmin(axis=-1).astype(np.uint8)
+
+
+def _ordered(pixels: np.ndarray, palette: np.ndarray, order: int) -> np.ndarray:
+    height, width, _ = pixels.shape
+    matrix = bayer_matrix(order)
+    reps = (-(-height // matrix.shape[0]), -(-width // matrix.shape[1]))
+    thresholds = np.tile(matrix, reps)[:height, :width, np.newaxis]
+
+    # Scale the threshold offset to the palette spacing so pixels between two
+    # entries are pushed either way in proportion to their distance.
+    spread = np.sqrt(((palette[:, np.newaxis] - palette) ** 2).sum(axis=-1)).max() / len(palette)
+    return _nearest(pixels + (thresholds - 0.5) * spread, palette)
+
+
+def _floyd_steinberg(pixels: np.ndarray, palette: np.ndarray) -> np.ndarray:
+    height, width, _ = pixels.shape
+    work = np.zeros((height + 1, width + 2, 3), dtype=np.float32)
+    work[:height, 1 : width + 1] = pixels
+    indices = np.zeros((height, width), dtype=np.uint8)
+
+    # Pixel (y, x) only depends on pixels with a smaller x + 2y, so every pixel
+    # on the same wavefront can be settled at once. Each diffusion target is
+    # updated in its own statement, as rows on one wavefront can share targets.
+    for step in range(width + 2 * (height - 1)):
+        rows = np.arange(max(0, (step - width + 2) // 2), min(height - 1, step // 2) + 1)
+        cols = step - 2 * rows + 1
+
+        current = work[rows, cols]
+        nearest = _nearest(current, palette)
+        indices[rows, cols - 1] = nearest
+        error = current - palette[nearest]
+
+        work[rows, cols + 1] += error * (7 / 16)
+        work[rows + 1, cols - 1] += error * (3 / 16)
+        work[rows + 1, cols] += error * (5 / 16)
+        work[rows + 1, cols + 1] += error * (1 / 16)
+
+    return indices
+
+
+def quantize(
+    source: Image.Image, color: str = "yellow", *, dither: _DITHER_MODE = "floyd-steinberg", order: int = 2
+) -> Image.Image:
+    """Convert an image to a paletted image for an inky display.
+
+    :param source: Image to convert, any mode PIL can convert to RGB.
+    :type source: PIL.Image.Image
+    :param color:
+        The display color, "black", "yellow", or "red".
+        Defaults to "yellow".
+    :type color: str, optional
+    :param dither:
+        Dithering method, "none", "bayer", or "floyd-steinberg".
+        Defaults to "floyd-steinberg".
+    :type dither: str, optional
+    :param order:
+        Bayer matrix order, only used for "bayer" dithering.
+        Defaults to 2, a 4x4 matrix.
+    :type order: int, optional
+
+    :return: Mode "P" image with the display palette applied.
+    :rtype: PIL.Image.Image
+
+    :raises ValueError: if the color or dither mode is invalid.
+    """
+    palette_list = get_palette(color)
+    palette = np.array(PALETTES[color], dtype=np.float32)
+    pixels = np.asarray(source.convert("RGB"), dtype=np.float32)
+
+    if dither == "none":
+        indices = _nearest(pixels, palette)
+    elif dither == "bayer":
+        indices = _ordered(pixels, palette, order)
+    elif dither == "floyd-steinberg":
+        indices = _floyd_steinberg(pixels, palette)
+    else:
+        raise ValueError('dither must be "none", "bayer", or "floyd-steinberg"')
+
+    logging.getLogger(__name__).debug("Quantized %s to %s palette using %s", source, color, dither)
+
+    image = Image.frombytes("P", source.size, indices.tobytes())
+    image.putpalette(palette_list)
+    return image
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert an image to an inky display palette.")
+    parser.add_argument("source", help="Image to convert")
+    parser.add_argument("output", help="Where to save the paletted PNG")
+    parser.add_argument("--color", choices=PALETTES, default="yellow")
+    parser.add_argument("--dither", choices=("none", "bayer", "floyd-steinberg"), default="floyd-steinberg")
+    args = parser.parse_args()
+
+    quantize(Image.open(args.source), args.color, dither=args.dither).save(args.output)
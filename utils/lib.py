@@ -3,16 +3,32 @@
 
 """Generic shared functions."""
 
+import atexit
 import configparser
 import logging
 import logging.config
+import logging.handlers
 import os
+import queue
 import sys
+import threading
 import toml
+from typing import Optional
 
 
 def load_logging() -> None:
-    """Load logging configuration."""
+    """Load logging configuration.
+
+    Notes:
+        Once loaded, the root logger's handlers are moved behind a queue so
+        log I/O happens on a background thread instead of the render path.
+
+        The generated configuration buffers file output to batch SD card writes.
+        Buffered records are written when the buffer fills, an error is logged,
+        the oldest record is 30 seconds old, or at exit. A power cut can lose
+        up to that last 30 seconds of INFO and WARNING lines.
+
+    """
     try:
         logging.config.fileConfig("config/logging.ini")
     except KeyError as inst:
@@ -23,6 +39,99 @@ def load_logging() -> None:
         print(f"Restricted access to one or more logging files - {inst}", file=sys.stderr)
     except Exception as inst:
         print(f"Unexpected exception, contact maintainer - {inst}", file=sys.stderr)
+    else:
+        queue_root_handlers()
+
+
+def queue_root_handlers() -> None:
+    """Move the root logger's handlers behind a queue serviced by a background thread.
+
+    Notes:
+        Logging calls only enqueue the record, a QueueListener hands records to the
+        configured handlers. The listener is stopped at exit, draining the queue.
+
+    """
+    root = logging.getLogger()
+    handlers = [handler for handler in root.handlers if not isinstance(handler, logging.handlers.QueueHandler)]
+    if not handlers:
+        return
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop)
+
+
+class TimedMemoryHandler(logging.handlers.MemoryHandler):
+    """MemoryHandler that also flushes once its oldest buffered record reaches a given age.
+
+    :param int capacity: Number of records to buffer before flushing.
+    :param flushLevel:
+        Level at which a record triggers an immediate flush.
+        Defaults to ERROR.
+    :type flushLevel: int, optional
+    :param target:
+        Handler receiving the flushed records.
+        Defaults to None, fileConfig sets it from the "target" option.
+    :type target: logging.Handler, optional
+    :param flushOnClose:
+        Whether to flush when closed.
+        Defaults to True.
+    :type flushOnClose: bool, optional
+    :param interval:
+        Seconds a record may wait in the buffer before it is flushed.
+        Defaults to 30.
+    :type interval: float, optional
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        flushLevel: int = logging.ERROR,
+        target: Optional[logging.Handler] = None,
+        flushOnClose: bool = True,
+        interval: float = 30.0,
+    ) -> None:
+        super(TimedMemoryHandler, self).__init__(capacity, flushLevel, target, flushOnClose)
+        self.interval = interval
+        self.__timer: Optional[threading.Timer] = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Buffer a record, starting the flush timer if the buffer was empty."""
+        super(TimedMemoryHandler, self).emit(record)
+        self.acquire()
+        try:
+            if self.buffer and self.__timer is None:
+                self.__timer = threading.Timer(self.interval, self.flush)
+                self.__timer.daemon = True
+                self.__timer.start()
+        finally:
+            self.release()
+
+    def flush(self) -> None:
+        """Write all buffered records to the target and stop the flush timer."""
+        self.acquire()
+        try:
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+            super(TimedMemoryHandler, self).flush()
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        """Stop the flush timer and close the handler."""
+        self.acquire()
+        try:
+            if self.__timer is not None:
+                self.__timer.cancel()
+                self.__timer = None
+        finally:
+            self.release()
+        super(TimedMemoryHandler, self).close()
 
 
 def logging_config_recovery(issue: FileNotFoundError) -> None:
@@ -66,14 +175,23 @@ def logging_log_recovery(issue: Exception) -> None:
 
 
 def create_logging_config() -> None:
-    """Generate a standard logging configuration."""
+    """Generate a standard logging configuration.
+
+    Notes:
+        File handlers sit behind TimedMemoryHandlers so writes to the SD card are
+        batched, flushing when the buffer fills, an error is logged, or the oldest
+        buffered record is 30 seconds old.
+
+    """
     config = configparser.ConfigParser()
     config["loggers"] = {"keys": "root"}
-    config["handlers"] = {"keys": "systemFileHandler, systemStreamHandler, errorFileHandler"}
+    config["handlers"] = {
+        "keys": "systemFileHandler, systemBufferHandler, systemStreamHandler, errorFileHandler, errorBufferHandler"
+    }
     config["formatters"] = {"keys": "systemFormatter, errorFormatter"}
     config["logger_root"] = {
         "level": "INFO",
-        "handlers": "systemFileHandler, systemStreamHandler, errorFileHandler"
+        "handlers": "systemBufferHandler, systemStreamHandler, errorBufferHandler"
     }
     config["handler_systemFileHandler"] = {
         "class": "logging.handlers.RotatingFileHandler",
@@ -81,6 +199,12 @@ def create_logging_config() -> None:
         "formatter": "systemFormatter",
         "args": "('logs/utilities.log', 'a+', 10 * 1024 * 1024, 10,)"
     }
+    config["handler_systemBufferHandler"] = {
+        "class": "utils.lib.TimedMemoryHandler",
+        "level": "INFO",
+        "target": "systemFileHandler",
+        "args": "(256, ERROR, None, True, 30.0,)"
+    }
     config["handler_systemStreamHandler"] = {
         "class": "StreamHandler",
         "level": "WARNING",
@@ -93,11 +217,17 @@ def create_logging_config() -> None:
         "formatter": "errorFormatter",
         "args": "('logs/utilities.errors.log', 'a+', 10 * 1024 * 1024, 10,)"
     }
+    config["handler_errorBufferHandler"] = {
+        "class": "utils.lib.TimedMemoryHandler",
+        "level": "WARNING",
+        "target": "errorFileHandler",
+        "args": "(64, ERROR, None, True, 30.0,)"
+    }
     config["formatter_systemFormatter"] = {
         "format": "%(asctime)s - %(name)s::%(module)s - %(levelname)s - %(message)s"
     }
     config["formatter_errorFormatter"] = {
-        "format": "%(asctime)s -- %(name)s::%(module)s::%(funcname)s::%(lineno)s -- %(levelname)s -- %(message)s"
+        "format": "%(asctime)s -- %(name)s::%(module)s::%(funcName)s::%(lineno)s -- %(levelname)s -- %(message)s"
     }
     with open("config/logging.ini", "w+") as out:
         config.write(out)
@@ -115,7 +245,7 @@ def validate_config(issue: Exception) -> None:
 
     """
     logger = logging.getLogger(__name__)
-    logger.warning(f"Configuration validation initiated due to exception - {issue}")
+    logger.warning("Configuration validation initiated due to exception - %s", issue)
     with open("config/utils.toml", "r") as conffile:
         try:
             config = toml.load(conffile)
@@ -145,6 +275,7 @@ def create_empty_config() -> None:
 
     config["system"]["screen"] = {}
     screen = config["system"]["screen"]
+    screen["util"] = "analog"
     screen["color"] = "yellow"
     screen["type"] = "phat"
     screen["orientation"] = "landscape"
@@ -156,10 +287,20 @@ def create_empty_config() -> None:
     config["utils"] = {}
 
     config["utils"]["analog"] = {}
-    config["utils"]["analog"]["second_hand"] = True
+    config["utils"]["analog"]["debug_png"] = False
+
+    config["utils"]["refresh"] = {}
+    refresh = config["utils"]["refresh"]
+    refresh["busy_ratio"] = 0.25
+    refresh["daily_refreshes"] = 288
+    refresh["night_start"] = 23
+    refresh["night_end"] = 6
+    refresh["night_interval"] = 1800
+    refresh["full_refresh"] = 3600
 
     config["utils"]["calendar"] = {}
     config["utils"]["calendar"]["week_start"] = "Monday"
+    config["utils"]["calendar"]["debug_png"] = False
 
     config["apis"] = {}
 
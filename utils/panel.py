@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Write rendered frames straight into packed inky panel bitplanes.
+
+Notes:
+    The inky driver's set_image and show copy the whole image into a new
+    array and pack fresh black and color planes on every refresh. A
+    PanelBuffer instead keeps both packed planes preallocated in the panel's
+    native byte layout, and fills them in place with a palette index lookup
+    and a bit weighting pass over the frame.
+
+    Flips and rotations are applied as numpy views, so the frame is only read
+    once when converting it into the planes.
+
+"""
+
+from PIL import Image
+from typing import Any, Callable, Optional
+import logging
+import threading
+import numpy as np
+
+
+_SINK = Callable[[memoryview, memoryview], None]
+
+_WEIGHTS = np.array([128, 64, 32, 16, 8, 4, 2, 1], dtype=np.uint8)
+
+# Palette index 1 is black and 2 is the accent color, the black plane is
+# active low while the color plane is active high.
+_BLACK_LUT = np.ones(256, dtype=np.uint8)
+_BLACK_LUT[1] = 0
+_COLOR_LUT = np.zeros(256, dtype=np.uint8)
+_COLOR_LUT[2] = 1
+
+
+class PanelBuffer(object):
+    """Preallocated packed black and color bitplanes for a panel.
+
+    :param int width: Panel width in pixels, as reported by the driver.
+    :param int height: Panel height in pixels, as reported by the driver.
+    :param turns:
+        Counterclockwise quarter turns applied to frames before the panel
+        transform, as with PIL's Image.rotate.
+        Defaults to 0.
+    :type turns: int, optional
+    :param rotation:
+        The driver's native rotation in degrees.
+        Defaults to 0.
+    :type rotation: int, optional
+    :param v_flip:
+        The driver's vertical flip setting.
+        Defaults to False.
+    :type v_flip: bool, optional
+    :param h_flip:
+        The driver's horizontal flip setting.
+        Defaults to False.
+    :type h_flip: bool, optional
+
+    :raises ValueError: if the panel's pixel count does not pack into whole bytes.
+    """
+
+    def __init__(
+        self, width: int, height: int, *, turns: int = 0, rotation: int = 0, v_flip: bool = False, h_flip: bool = False
+    ) -> None:
+        super(PanelBuffer, self).__init__()
+
+        if (width * height) % 8:
+            raise ValueError("panel pixel count must be a multiple of 8")
+
+        self.__width = width
+        self.__height = height
+        self.__turns = turns % 4
+        self.__rotation = rotation
+        self.__v_flip = v_flip
+        self.__h_flip = h_flip
+
+        frame_shape = (height, width) if self.__turns % 2 == 0 else (width, height)
+        self.__bits = np.empty(self._transform(np.empty(frame_shape, dtype=np.uint8)).shape, dtype=np.uint8)
+        self.__black = np.empty(width * height // 8, dtype=np.uint8)
+        self.__color = np.empty(width * height // 8, dtype=np.uint8)
+
+        self.__logger = logging.getLogger(__name__)
+        self.__logger.debug("%s", self.__dict__)
+
+    def __repr__(self) -> str:
+        return f"PanelBuffer(width={self.__width}, height={self.__height})"
+
+    @classmethod
+    def for_display(cls, display: Any, *, turns: int = 0) -> "PanelBuffer":
+        """Build a buffer matching an inky driver's resolution and orientation.
+
+        :param display: An inky display driver instance.
+        :param turns:
+            Counterclockwise quarter turns applied to frames.
+            Defaults to 0.
+        :type turns: int, optional
+
+        :return: A buffer in the display's native layout.
+        :rtype: PanelBuffer
+        """
+        return cls(
+            display.width,
+            display.height,
+            turns=turns,
+            rotation=getattr(display, "rotation", 0),
+            v_flip=getattr(display, "v_flip", False),
+            h_flip=getattr(display, "h_flip", False),
+        )
+
+    @property
+    def black(self) -> memoryview:
+        """Packed black plane, a zero bit is a black pixel."""
+        return self.__black.data
+
+    @property
+    def color(self) -> memoryview:
+        """Packed color plane, a set bit is an accent color pixel."""
+        return self.__color.data
+
+    def write(self, frame: Image.Image) -> None:
+        """Convert a paletted frame into the packed planes in place.
+
+        :param frame: Mode "P" frame using inky palette indices.
+        :type frame: PIL.Image.Image
+
+        :raises ValueError: if the frame does not fit the panel once turned.
+        """
+        region = self._transform(np.asarray(frame))
+        if region.shape != self.__bits.shape:
+            raise ValueError(f"frame of size {frame.size} does not fit panel {self.__width}x{self.__height}")
+
+        packed = self.__bits.reshape(-1, 8)
+        np.take(_BLACK_LUT, region, out=self.__bits, mode="clip")
+        np.matmul(packed, _WEIGHTS, out=self.__black)
+        np.take(_COLOR_LUT, region, out=self.__bits, mode="clip")
+        np.matmul(packed, _WEIGHTS, out=self.__color)
+
+    def flush(self, sink: _SINK) -> None:
+        """Hand the packed planes to a sink.
+
+        :param sink: Callable taking the black and color planes.
+        """
+        sink(self.black, self.color)
+
+    def _transform(self, pixels: np.ndarray) -> np.ndarray:
+        region = np.rot90(pixels, self.__turns)
+        if self.__v_flip:
+            region = np.fliplr(region)
+        if self.__h_flip:
+            region = np.flipud(region)
+        if self.__rotation:
+            region = np.rot90(region, self.__rotation // 90)
+        return region
+
+
+class InkySink(object):
+    """Sink pushing packed planes to an inky driver.
+
+    :param display: An inky display driver instance.
+    :param border:
+        Palette index for the panel border, defaults to the driver's black.
+    :type border: int, optional
+    """
+
+    def __init__(self, display: Any, border: Optional[int] = None) -> None:
+        super(InkySink, self).__init__()
+
+        self.__display = display
+        self.__display.set_border(display.BLACK if border is None else border)
+
+    def __repr__(self) -> str:
+        return f"InkySink(display={self.__display})"
+
+    def __call__(self, black: memoryview, color: memoryview) -> None:
+        # The driver hands these to spidev, which only accepts lists.
+        self.__display._update(black.tolist(), color.tolist())
+
+
+class SimulatedSink(object):
+    """Sink standing in for the SPI bus when no panel is attached.
+
+    Keeps references to the last planes received and counts bytes written.
+    """
+
+    def __init__(self) -> None:
+        super(SimulatedSink, self).__init__()
+
+        self.black: Optional[memoryview] = None
+        self.color: Optional[memoryview] = None
+        self.written = 0
+
+        self.__logger = logging.getLogger(__name__)
+
+    def __repr__(self) -> str:
+        return f"SimulatedSink(written={self.written})"
+
+    def __call__(self, black: memoryview, color: memoryview) -> None:
+        self.black = black
+        self.color = color
+        self.written += black.nbytes + color.nbytes
+        self.__logger.debug("Simulated SPI write of %s bytes", black.nbytes + color.nbytes)
+
+
+def export_png(frame: Image.Image, path: str) -> threading.Thread:
+    """Save a debug PNG of a frame on a background thread.
+
+    :param frame: Frame to save, it must not be drawn on until the thread finishes.
+    :type frame: PIL.Image.Image
+    :param str path: Where to save the PNG.
+
+    :return: The started thread.
+    :rtype: threading.Thread
+    """
+    thread = threading.Thread(target=frame.save, args=(path,), name=f"export-{path}")
+    thread.start()
+    return thread
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Choose how often and how much to redraw based on measured panel refresh cost.
+
+Notes:
+    Each panel keeps a small state file with a moving average of its measured
+    push latency and a digest of the last frame pushed, since the utilities
+    run as short lived processes.
+
+    The update interval is the shortest cadence that keeps the panel busy for
+    no more than a set fraction of the time and stays within a daily refresh
+    budget. Unchanged frames are skipped, apart from a periodic full refresh
+    to clear ghosting.
+
+    Callers are expected to run once a minute, at the start of the minute,
+    for example from cron. Every cadence divides a day into whole minutes and
+    a run is due when the minute of the day falls on the cadence. Nothing
+    updates more often than once a minute, so the second hand is never drawn,
+    and at cadences of an hour or more only the hour hand is drawn, as a
+    minute hand would be stale for most of the interval.
+
+"""
+
+from PIL import Image
+from typing import NamedTuple, Optional
+import hashlib
+import json
+import logging
+import os
+import time
+
+
+_CADENCES = (60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 14400, 21600, 43200, 86400)
+_SMOOTHING = 0.3
+_HOUR_HAND_ONLY = 3600
+
+
+class Decision(NamedTuple):
+    """Refresh plan for a single run."""
+
+    due: bool
+    interval: int
+    hand_count: int
+
+
+class RefreshPolicy(object):
+    """Adaptive refresh policy for a single panel.
+
+    :param str name: Panel name, used for the state file and logs.
+    :param busy_ratio:
+        Largest fraction of each interval the panel may spend refreshing.
+        Defaults to 0.25.
+    :type busy_ratio: float, optional
+    :param daily_refreshes:
+        Most refreshes allowed per day, limiting panel wear.
+        Defaults to 288, every five minutes.
+    :type daily_refreshes: int, optional
+    :param night_start:
+        Hour at which night starts.
+        Defaults to 23.
+    :type night_start: int, optional
+    :param night_end:
+        Hour at which night ends.
+        Defaults to 6.
+    :type night_end: int, optional
+    :param night_interval:
+        Shortest interval in seconds used at night, at most a day.
+        Defaults to 1800.
+    :type night_interval: int, optional
+    :param full_refresh:
+        Seconds after which an unchanged frame is pushed anyway to clear ghosting.
+        Defaults to 3600.
+    :type full_refresh: int, optional
+    :param state_dir:
+        Directory holding policy state.
+        Defaults to "cache", created if absent.
+    :type state_dir: str, optional
+
+    :raises ValueError: if any setting is out of range.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        busy_ratio: float = 0.25,
+        daily_refreshes: int = 288,
+        night_start: int = 23,
+        night_end: int = 6,
+        night_interval: int = 1800,
+        full_refresh: int = 3600,
+        state_dir: str = "cache",
+    ) -> None:
+        super(RefreshPolicy, self).__init__()
+
+        if not 0 < busy_ratio <= 1:
+            raise ValueError("busy_ratio must be above 0 and at most 1")
+        if daily_refreshes < 1:
+            raise ValueError("daily_refreshes must be at least 1")
+        if not (0 <= night_start <= 23 and 0 <= night_end <= 23):
+            raise ValueError("night_start and night_end must be hours from 0 to 23")
+        if not 0 < night_interval <= _CADENCES[-1]:
+            raise ValueError(f"night_interval must be above 0 and at most {_CADENCES[-1]} seconds")
+        if full_refresh <= 0:
+            raise ValueError("full_refresh must be above 0")
+
+        self.__name = name
+        self.__busy_ratio = busy_ratio
+        self.__daily_refreshes = daily_refreshes
+        self.__night = (night_start, night_end)
+        self.__night_interval = night_interval
+        self.__full_refresh = full_refresh
+        self.__state_dir = state_dir
+        self.__path = os.path.join(state_dir, f"refresh-{name}.json")
+
+        self.__logger = logging.getLogger(__name__)
+
+        self.__latency: Optional[float] = None
+        self.__digest = ""
+        self.__pushed = 0.0
+        try:
+            with open(self.__path, "r") as infile:
+                state = json.load(infile)
+            latency = None if state["latency"] is None else float(state["latency"])
+            digest = str(state["digest"])
+            pushed = float(state["pushed"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError) as inst:
+            self.__logger.warning("%s: ignoring unreadable refresh state - %s", name, inst)
+        else:
+            self.__latency = latency
+            self.__digest = digest
+            self.__pushed = pushed
+
+        self.__logger.debug("%s", self.__dict__)
+
+    def __repr__(self) -> str:
+        return f"RefreshPolicy(name={self.__name})"
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Average measured push latency in seconds, None until first measured."""
+        return self.__latency
+
+    def plan(self, now: time.struct_time) -> Decision:
+        """Decide the update interval and whether this run is due.
+
+        Meant to be called once a minute, see the module notes.
+
+        :param now: Time of this run.
+        :type now: time.struct_time
+
+        :return: The refresh plan for this run.
+        :rtype: Decision
+        """
+        shortest = 86400 / max(1, self.__daily_refreshes)
+        if self.__latency is not None:
+            shortest = max(shortest, self.__latency / self.__busy_ratio)
+
+        start, end = self.__night
+        night = (now.tm_hour >= start or now.tm_hour < end) if start > end else (start <= now.tm_hour < end)
+        if night:
+            shortest = max(shortest, self.__night_interval)
+
+        interval = next((cadence for cadence in _CADENCES if cadence >= shortest), _CADENCES[-1])
+        if shortest > interval:
+            self.__logger.warning(
+                "%s: wanted an interval of %.0fs, capped to the longest cadence of %ss", self.__name, shortest, interval
+            )
+
+        due = (now.tm_hour * 60 + now.tm_min) % (interval // 60) == 0
+        hand_count = 1 if interval >= _HOUR_HAND_ONLY else 2
+
+        self.__logger.info(
+            "%s: every %ss%s, hand count %s, latency %s, %s",
+            self.__name,
+            interval,
+            " (night)" if night else "",
+            hand_count,
+            "unmeasured" if self.__latency is None else f"{self.__latency:.2f}s",
+            "due" if due else "not due",
+        )
+        return Decision(due, interval, hand_count)
+
+    def should_push(self, frame: Image.Image) -> bool:
+        """Decide whether a frame needs pushing to the panel.
+
+        :param frame: The rendered frame.
+        :type frame: PIL.Image.Image
+
+        :return: False if the frame matches the last pushed frame and no full refresh is due.
+        :rtype: bool
+        """
+        if _digest(frame) != self.__digest:
+            return True
+        if time.time() - self.__pushed >= self.__full_refresh:
+            self.__logger.info("%s: frame unchanged, full refresh to clear ghosting", self.__name)
+            return True
+        self.__logger.info("%s: frame unchanged, skipping refresh", self.__name)
+        return False
+
+    def record_push(self, frame: Image.Image, seconds: float) -> None:
+        """Record a completed push and its measured latency.
+
+        :param frame: The frame that was pushed.
+        :type frame: PIL.Image.Image
+        :param float seconds: How long the push took.
+        """
+        if self.__latency is None:
+            self.__latency = seconds
+        else:
+            self.__latency += _SMOOTHING * (seconds - self.__latency)
+        self.__digest = _digest(frame)
+        self.__pushed = time.time()
+        self.__logger.info("%s: push took %.2fs, average %.2fs", self.__name, seconds, self.__latency)
+
+        os.makedirs(self.__state_dir, exist_ok=True)
+        with open(f"{self.__path}.tmp", "w+") as out:
+            json.dump({"latency": self.__latency, "digest": self.__digest, "pushed": self.__pushed}, out)
+        os.replace(f"{self.__path}.tmp", self.__path)
+
+
+def _digest(frame: Image.Image) -> str:
+    return hashlib.blake2b(frame.tobytes(), digest_size=16).hexdigest()